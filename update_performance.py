@@ -1,9 +1,15 @@
+import asyncio
+import calendar
+import hashlib
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import ijson
+import orjson
 import os
-import time
-from datetime import datetime
-from statistics import mean
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timezone
 
 # Myfxbook account IDs
 ACCOUNTS = {
@@ -27,13 +33,35 @@ ACCOUNTS = {
     }
 }
 
+# (output key, Myfxbook field, decimals) for stats copied straight from the account summary
+ACCOUNT_STAT_FIELDS = [
+    ("total_gain", "gain", 2),
+    ("avg_daily", "dailyGain", 2),
+    ("balance", "balance", 2),
+    ("equity", "equity", 2),
+    ("drawdown", "drawdown", 2)
+]
+
+# Daily history is cached between runs so only the newest days are downloaded
+CACHE_DIR = ".cache/myfxbook"
+
+# Part of the daily data fingerprint; bump it whenever calculate_monthly_stats changes so
+# monthly figures saved by an older version are recomputed instead of reused
+MONTHLY_STATS_VERSION = 1
+
 class MyfxbookAPI:
     BASE_URL = "https://www.myfxbook.com/api"
+    LOGIN_URL = f"{BASE_URL}/login.json"
+    ACCOUNTS_URL = f"{BASE_URL}/get-my-accounts.json"
+    DAILY_DATA_URL = f"{BASE_URL}/get-data-daily.json"
     
     def __init__(self, email, password):
         self.email = email
         self.password = password
         self.session_token = None
+        # get-my-accounts.json returns every account at once, so fetch it once and index by id
+        self._accounts_cache = None
+        self._accounts_lock = threading.Lock()
         # Use requests.Session for cookie handling
         self.session = requests.Session()
         self.session.headers.update({
@@ -48,10 +76,26 @@ class MyfxbookAPI:
             'Sec-Fetch-Mode': 'cors',
             'Sec-Fetch-Site': 'same-origin'
         })
+        # Retry transient server errors with exponential backoff, waiting longer if the server
+        # sends Retry-After (the workflow's timeout bounds the total). A 429 rate limit is not
+        # retried: hammering it again would only extend the block.
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[500, 502, 503, 504],
+            raise_on_status=False
+        )
+        # Pool keep-alive connections so requests (and retries) reuse sockets instead of redoing the TLS handshake
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=retry
+        )
+        self.session.mount("https://", adapter)
     
     def login(self):
         """Login to Myfxbook and get session token"""
-        url = f"{self.BASE_URL}/login.json"
+        url = self.LOGIN_URL
         
         # Try with params (GET style)
         params = {
@@ -65,14 +109,13 @@ class MyfxbookAPI:
             # First try: GET request (original method)
             response = self.session.get(url, params=params, timeout=30)
             
-            # If 403, try POST method instead
+            # If 403, try POST method instead; it goes through the same pooled, retrying session
             if response.status_code == 403:
                 print("⚠️ GET method blocked, trying POST...")
-                time.sleep(2)
                 response = self.session.post(url, data=params, timeout=30)
             
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             if data.get("error"):
                 raise Exception(f"Login failed: {data.get('message', 'Unknown error')}")
@@ -96,103 +139,257 @@ class MyfxbookAPI:
         if not self.session_token:
             raise Exception("Not logged in. Call login() first.")
         
-        url = f"{self.BASE_URL}/get-my-accounts.json"
-        params = {"session": self.session_token}
-        
         try:
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("error"):
-                raise Exception(f"API error: {data.get('message')}")
+            accounts = self._fetch_all_accounts()
             
-            accounts = data.get("accounts", [])
-            for account in accounts:
-                if account.get("id") == account_id:
-                    return account
+            if account_id not in accounts:
+                raise Exception(f"Account {account_id} not found")
             
-            raise Exception(f"Account {account_id} not found")
+            return accounts[account_id]
         
         except Exception as e:
             print(f"❌ Error fetching account {account_id}: {e}")
             raise
     
+    def _fetch_all_accounts(self):
+        """Fetch all accounts once per session and return them keyed by id"""
+        # Accounts are processed concurrently; the lock makes the others wait for the first fetch
+        with self._accounts_lock:
+            if self._accounts_cache is None:
+                url = self.ACCOUNTS_URL
+                params = {"session": self.session_token}
+                
+                response = self.session.get(url, params=params, timeout=30)
+                response.raise_for_status()
+                data = orjson.loads(response.content)
+                
+                if data.get("error"):
+                    raise Exception(f"API error: {data.get('message')}")
+                
+                self._accounts_cache = {
+                    account.get("id"): account for account in data.get("accounts", [])
+                }
+            
+            return self._accounts_cache
+    
     def get_daily_data(self, account_id):
         """Get daily gain data for calculating monthly averages"""
         if not self.session_token:
             raise Exception("Not logged in")
         
-        url = f"{self.BASE_URL}/get-data-daily.json"
+        url = self.DAILY_DATA_URL
         params = {
             "session": self.session_token,
             "id": account_id
         }
         
+        # Falls back to the cached history if the incremental fetch fails
+        cached_data = {}
+        
         try:
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            cached_data = load_daily_cache(account_id)
+            cached_dates = [date_str for date_str in cached_data if is_date_key(date_str)]
+            if cached_dates:
+                # Re-fetch from the last cached day so a partially recorded day gets refreshed
+                params["start"] = max(cached_dates)
+                params["end"] = datetime.now(timezone.utc).strftime("%Y-%m-%d")
             
-            if data.get("error"):
-                print(f"⚠️ Daily data error for account {account_id}: {data.get('message')}")
-                return None
+            with self.session.get(url, params=params, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                # Let urllib3 undo gzip/deflate so ijson sees plain JSON
+                response.raw.decode_content = True
+                
+                # Stream the body and keep only the dataDaily entries instead of
+                # buffering the whole history and parsing it into a dict first
+                daily_data = {}
+                error = False
+                message = None
+                for prefix, event, value in ijson.parse(response.raw, use_float=True):
+                    if prefix == "error":
+                        error = value
+                    elif prefix == "message":
+                        message = value
+                    elif prefix.startswith("dataDaily.") and event in ("number", "string"):
+                        daily_data[prefix[len("dataDaily."):]] = value
             
-            return data.get("dataDaily", {})
+            if error:
+                print(f"⚠️ Daily data error for account {account_id}: {message}")
+                return cached_data or None
+            
+            daily_data = {**cached_data, **daily_data}
+            save_daily_cache(account_id, daily_data)
+            return daily_data
         
         except Exception as e:
             print(f"⚠️ Error fetching daily data for {account_id}: {e}")
-            return None
+            return cached_data or None
+
+def is_date_key(date_str):
+    """Cheap check that a dataDaily key is shaped like YYYY-MM-DD"""
+    return len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-'
+
+def load_daily_cache(account_id):
+    """Load daily data cached by a previous run"""
+    cache_file = os.path.join(CACHE_DIR, f"daily_{account_id}.json")
+    
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    
+    # Treat a cache file of any other shape as missing rather than failing the account
+    if not isinstance(cache, dict) or not isinstance(cache.get("dataDaily"), dict):
+        return {}
+    
+    return cache["dataDaily"]
+
+def save_daily_cache(account_id, daily_data):
+    """Cache daily data for the next run"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_file = os.path.join(CACHE_DIR, f"daily_{account_id}.json")
+    
+    with open(cache_file, 'wb') as f:
+        f.write(orjson.dumps({"dataDaily": daily_data}))
+
+def hash_daily_data(daily_data):
+    """Fingerprint daily data and the stats version so an unchanged history can be detected between runs"""
+    if not daily_data:
+        return None
+    
+    payload = {"version": MONTHLY_STATS_VERSION, "dataDaily": daily_data}
+    return hashlib.blake2b(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+def load_daily_hash(account_id):
+    """Load the daily data fingerprint saved by a previous run"""
+    hash_file = os.path.join(CACHE_DIR, f"daily_{account_id}.hash")
+    
+    try:
+        with open(hash_file) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def save_daily_hash(account_id, daily_hash):
+    """Save the daily data fingerprint for the next run"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    hash_file = os.path.join(CACHE_DIR, f"daily_{account_id}.hash")
+    
+    with open(hash_file, 'w') as f:
+        f.write(daily_hash)
+
+def load_previous_accounts(output_file):
+    """Load the accounts from the last performance_data.json, keyed by name"""
+    try:
+        with open(output_file, 'rb') as f:
+            previous_data = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    
+    # The file may have been edited by hand, so ignore anything not shaped like our own output
+    if not isinstance(previous_data, dict) or not isinstance(previous_data.get("accounts"), list):
+        return {}
+    
+    return {
+        account["name"]: account
+        for account in previous_data["accounts"]
+        if isinstance(account, dict) and "name" in account
+    }
+
+def reusable_monthly_stats(previous):
+    """Return (monthly_history, min, max, avg) from a previous account entry, or None if incomplete"""
+    if not previous:
+        return None
+    
+    monthly_history = previous.get("monthly_history")
+    previous_stats = previous.get("stats")
+    if not isinstance(monthly_history, list) or not isinstance(previous_stats, dict):
+        return None
+    
+    monthly_values = [previous_stats.get(key) for key in ("min_monthly", "max_monthly", "avg_monthly")]
+    if not all(isinstance(value, (int, float)) for value in monthly_values):
+        return None
+    
+    return (monthly_history, *monthly_values)
 
 def calculate_monthly_stats(daily_data):
-    """Calculate monthly statistics from daily data"""
+    """Calculate monthly statistics from daily data.
+    
+    Returns the monthly history (newest first) along with the min, max and
+    average monthly return.
+    """
     if not daily_data:
-        return []
+        return [], 0, 0, 0
     
-    monthly_returns = {}
+    # Running total per (year, month); date.fromisoformat is C-implemented, unlike strptime
+    monthly_totals = defaultdict(float)
     
     for date_str, gain in daily_data.items():
+        # Cheap shape check so well-formed rows never touch the exception path
+        if not is_date_key(date_str):
+            continue
+        
         try:
-            date = datetime.strptime(date_str, "%Y-%m-%d")
-            month_key = date.strftime("%Y-%m")
-            
-            if month_key not in monthly_returns:
-                monthly_returns[month_key] = []
-            
-            monthly_returns[month_key].append(float(gain))
-        except:
+            day = date.fromisoformat(date_str)
+            gain = float(gain)
+        except (TypeError, ValueError):
             continue
+        
+        monthly_totals[(day.year, day.month)] += gain
     
     monthly_stats = []
-    for month, gains in sorted(monthly_returns.items(), reverse=True):
-        month_total = sum(gains)
-        month_date = datetime.strptime(month, "%Y-%m")
-        
+    min_monthly = max_monthly = None
+    total_return = 0
+    for (year, month), month_total in sorted(monthly_totals.items(), reverse=True):
+        month_return = round(month_total, 2)
         monthly_stats.append({
-            "month": month_date.strftime("%B %Y"),
-            "return": round(month_total, 2)
+            "month": f"{calendar.month_name[month]} {year}",
+            "return": month_return
         })
+        
+        if min_monthly is None or month_return < min_monthly:
+            min_monthly = month_return
+        if max_monthly is None or month_return > max_monthly:
+            max_monthly = month_return
+        total_return += month_return
     
-    return monthly_stats
+    if not monthly_stats:
+        return [], 0, 0, 0
+    
+    return monthly_stats, min_monthly, max_monthly, total_return / len(monthly_stats)
 
-def process_account(api, account_key, account_info):
-    """Process single account and return formatted data"""
+def process_account(account_key, account_info, account_data, daily_data, previous=None):
+    """Process single account's fetched data and return formatted data.
+    
+    `previous` is the account's entry from the last run, passed only when its
+    daily history is unchanged so the monthly figures can be reused.
+    """
     print(f"\n📊 Processing {account_info['name']}...")
     
     try:
-        account_data = api.get_account_data(account_info['id'])
-        daily_data = api.get_daily_data(account_info['id'])
-        monthly_stats = calculate_monthly_stats(daily_data)
+        # Fetches run concurrently with return_exceptions=True, so failures arrive as values
+        if isinstance(account_data, Exception):
+            raise account_data
+        if isinstance(daily_data, Exception):
+            raise daily_data
         
-        if monthly_stats:
-            monthly_returns = [m['return'] for m in monthly_stats]
-            min_monthly = min(monthly_returns)
-            max_monthly = max(monthly_returns)
-            avg_monthly = mean(monthly_returns)
+        reused = reusable_monthly_stats(previous)
+        if reused:
+            print(f"♻️ {account_info['name']}: daily data unchanged, reusing monthly stats")
+            monthly_history, min_monthly, max_monthly, avg_monthly = reused
         else:
-            min_monthly = 0
-            max_monthly = 0
-            avg_monthly = 0
+            monthly_stats, min_monthly, max_monthly, avg_monthly = calculate_monthly_stats(daily_data)
+            monthly_history = monthly_stats[:12]
+        
+        stats = {
+            out_key: round(float(account_data.get(api_key, 0)), decimals)
+            for out_key, api_key, decimals in ACCOUNT_STAT_FIELDS
+        }
+        stats["min_monthly"] = round(min_monthly, 2)
+        stats["avg_monthly"] = round(avg_monthly, 2)
+        stats["max_monthly"] = round(max_monthly, 2)
+        profit_factor = account_data.get("profitFactor")
+        stats["win_rate"] = round(float(profit_factor) * 100, 1) if profit_factor else 0
         
         result = {
             "name": account_info['name'],
@@ -201,18 +398,8 @@ def process_account(api, account_key, account_info):
             "fee": account_info['fee'],
             "myfxbook_url": account_info['myfxbook_url'],
             "signal_url": account_info['signal_url'],
-            "stats": {
-                "total_gain": round(float(account_data.get("gain", 0)), 2),
-                "min_monthly": round(min_monthly, 2),
-                "avg_monthly": round(avg_monthly, 2),
-                "max_monthly": round(max_monthly, 2),
-                "avg_daily": round(float(account_data.get("dailyGain", 0)), 2),
-                "balance": round(float(account_data.get("balance", 0)), 2),
-                "equity": round(float(account_data.get("equity", 0)), 2),
-                "drawdown": round(float(account_data.get("drawdown", 0)), 2),
-                "win_rate": round(float(account_data.get("profitFactor", 0)) * 100, 1) if account_data.get("profitFactor") else 0
-            },
-            "monthly_history": monthly_stats[:12]
+            "stats": stats,
+            "monthly_history": monthly_history
         }
         
         print(f"✅ {account_info['name']}: {result['stats']['total_gain']}% total gain")
@@ -222,7 +409,7 @@ def process_account(api, account_key, account_info):
         print(f"❌ Failed to process {account_info['name']}: {e}")
         return None
 
-def main():
+async def main():
     email = os.environ.get('MYFXBOOK_EMAIL')
     password = os.environ.get('MYFXBOOK_PASSWORD')
     
@@ -247,23 +434,45 @@ def main():
         print("="*60)
         raise
     
+    output_file = "performance_data.json"
+    previous_accounts = load_previous_accounts(output_file)
+    
     performance_data = {
-        "last_updated": datetime.utcnow().isoformat() + "Z",
+        "last_updated": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
         "accounts": []
     }
     
-    for key, info in ACCOUNTS.items():
-        account_data = process_account(api, key, info)
-        if account_data:
-            performance_data["accounts"].append(account_data)
+    # Every call after login is independent, so fire all accounts' summary and daily
+    # requests at once; results come back in order as (account, daily) pairs
+    calls = []
+    for info in ACCOUNTS.values():
+        calls.append(asyncio.to_thread(api.get_account_data, info['id']))
+        calls.append(asyncio.to_thread(api.get_daily_data, info['id']))
+    results = await asyncio.gather(*calls, return_exceptions=True)
     
-    output_file = "performance_data.json"
-    with open(output_file, 'w') as f:
-        json.dump(performance_data, f, indent=2)
+    daily_hashes = {}
+    for (key, info), account_data, daily_data in zip(ACCOUNTS.items(), results[0::2], results[1::2]):
+        daily_hash = None if isinstance(daily_data, Exception) else hash_daily_data(daily_data)
+        # Daily history unchanged since the last saved run, so its monthly figures still hold
+        unchanged = daily_hash is not None and daily_hash == load_daily_hash(info['id'])
+        previous = previous_accounts.get(info['name']) if unchanged else None
+        account_result = process_account(key, info, account_data, daily_data, previous)
+        if account_result:
+            performance_data["accounts"].append(account_result)
+            daily_hashes[info['id']] = daily_hash
+    
+    # Compact output: the file is only read by the website's fetch()
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(performance_data))
+    
+    # Only record fingerprints once the stats computed from them are saved
+    for account_id, daily_hash in daily_hashes.items():
+        if daily_hash:
+            save_daily_hash(account_id, daily_hash)
     
     print(f"\n✅ Performance data saved to {output_file}")
     print(f"📊 Updated {len(performance_data['accounts'])} accounts")
     print(f"🕒 Last updated: {performance_data['last_updated']}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())